@@ -0,0 +1,123 @@
+import numpy as np
+
+from Game2048 import *
+from Game2048 import _ROW_LEFT, _ROW_RIGHT, _ROW_SCORE, _ROW_LEGAL, _COL_UP, _COL_DOWN, _FOUR_PROBABILITY
+
+# Many packed boards (the toInt() encoding) held in one uint64 array, with
+# every operation applied to the whole batch at once. All shifts and masks
+# are uint64 so numpy never falls back to floats.
+_U = np.uint64
+
+_LEFT = np.frombuffer(_ROW_LEFT, dtype=np.uint16).astype(np.uint64)
+_RIGHT = np.frombuffer(_ROW_RIGHT, dtype=np.uint16).astype(np.uint64)
+_UP = np.frombuffer(_COL_UP, dtype=np.uint64)
+_DOWN = np.frombuffer(_COL_DOWN, dtype=np.uint64)
+_SCORE = np.frombuffer(_ROW_SCORE, dtype=np.uint32).astype(np.int64)
+_LEGAL = np.frombuffer(_ROW_LEGAL, dtype=np.uint8)
+
+_POPCOUNT = np.array([ bin(i).count('1') for i in range(256) ], dtype=np.uint8)
+_TILE_SHIFTS = np.arange(60, -4, -4, dtype=np.uint64)
+
+def _transpose(x):
+	a = x & _U(0xF0F00F0FF0F00F0F) | (x & _U(0x0000F0F00000F0F0)) << _U(12) | (x & _U(0x0F0F00000F0F0000)) >> _U(12)
+	return a & _U(0xFF00FF0000FF00FF) | (a & _U(0x00FF00FF00000000)) >> _U(24) | (a & _U(0x00000000FF00FF00)) << _U(24)
+
+def _rows(x):
+	return x >> _U(48), x >> _U(32) & _U(0xFFFF), x >> _U(16) & _U(0xFFFF), x & _U(0xFFFF)
+
+class Batch2048:
+	def __init__(self, boards, scores=None, rng=None):
+		try:
+			self._boards = np.asarray(boards, dtype=np.uint64)
+		except OverflowError:
+			raise ValueError('Batch2048 cannot hold a tile above 32768, use Game2048') from None
+		if scores is None:
+			self._scores = np.zeros(len(self._boards), dtype=np.int64)
+		else:
+			self._scores = np.asarray(scores, dtype=np.int64)
+
+		if rng is None:
+			self._rng = np.random.default_rng()
+		else:
+			self._rng = rng
+
+	@classmethod
+	def fromGames(cls, games, rng=None):
+		return cls([ g.toInt() for g in games ], [ g.getScore() for g in games ], rng)
+
+	@classmethod
+	def randomized(cls, n, rng=None):
+		# n boards drawn from the same tile distribution as Game2048.randomize()
+		if rng is None:
+			rng = np.random.default_rng()
+		tiles = rng.choice(4, size=(n, 16), p=[16/23, 4/23, 2/23, 1/23]).astype(np.uint64)
+		return cls(np.bitwise_or.reduce(tiles << _TILE_SHIFTS, axis=1), None, rng)
+
+	def __len__(self):
+		return len(self._boards)
+
+	def __getitem__(self, i):
+		return Bitboard2048(int(self._boards[i]), int(self._scores[i]))
+
+	def toGames(self):
+		return [ Bitboard2048(int(b), int(s)) for b, s in zip(self._boards, self._scores) ]
+
+	def getBoards(self):
+		return self._boards
+
+	def getScores(self):
+		return self._scores
+
+	def move(self, action):
+		b = self._boards
+		if action == 'L' or action == 'R':
+			if action == 'L':
+				table = _LEFT
+			else:
+				table = _RIGHT
+			r0, r1, r2, r3 = _rows(b)
+			board = table[r0] << _U(48) | table[r1] << _U(32) | table[r2] << _U(16) | table[r3]
+		elif action == 'U' or action == 'D':
+			if action == 'U':
+				table = _UP
+			else:
+				table = _DOWN
+			r0, r1, r2, r3 = _rows(_transpose(b))
+			board = b ^ table[r0] << _U(12) ^ table[r1] << _U(8) ^ table[r2] << _U(4) ^ table[r3]
+		else:
+			print('ERROR move =', action)
+			return
+
+		s = self._scores + _SCORE[r0] + _SCORE[r1] + _SCORE[r2] + _SCORE[r3]
+		return Batch2048(board, s, self._rng)
+
+	def actionMask(self):
+		# Bits 0 to 3 are set when U, D, L and R are legal, as in Game2048.actionMask()
+		r0, r1, r2, r3 = _rows(self._boards)
+		rows = _LEGAL[r0] | _LEGAL[r1] | _LEGAL[r2] | _LEGAL[r3]
+		r0, r1, r2, r3 = _rows(_transpose(self._boards))
+		columns = _LEGAL[r0] | _LEGAL[r1] | _LEGAL[r2] | _LEGAL[r3]
+		return rows << 2 | columns
+
+	def emptyCount(self):
+		b = self._boards
+		x = b | b >> _U(1)
+		x |= x >> _U(2)
+		empty = ~x & _U(0x1111111111111111)
+		return _POPCOUNT[empty.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+	def gameOver(self):
+		return self.actionMask() == 0
+
+	def addRandomTile(self):
+		# Places a 2 (or a 4 with probability _FOUR_PROBABILITY) on a uniformly
+		# chosen empty tile of every board that has one
+		b = self._boards
+		empty = (b[:, None] >> _TILE_SHIFTS & _U(15)) == 0
+		count = empty.sum(axis=1)
+		k = (self._rng.random(len(b)) * count).astype(np.int64)
+		rank = np.cumsum(empty, axis=1) - 1
+		i = np.argmax(empty & (rank == k[:, None]), axis=1).astype(np.uint64)
+		v = np.where(self._rng.random(len(b)) < _FOUR_PROBABILITY, _U(2), _U(1))
+		board = np.where(count > 0, b | v << (_U(60) - _U(4)*i), b)
+		return Batch2048(board, self._scores, self._rng)
@@ -0,0 +1,132 @@
+from Game2048 import *
+
+import sys, argparse, copy, json, platform, random, timeit, tracemalloc
+
+BACKENDS = {'game': Game2048, 'bitboard': Bitboard2048}
+
+def corpus(seed=2048, games=8, every=20):
+	# Mid-game positions from seeded games that keep the big tiles in the top
+	# left corner, so the same boards come out on every run and backend. Every
+	# board has an empty tile and a legal move.
+	boards = []
+	for g in range(games):
+		state = Game2048(rng=random.Random(seed + g)).addRandomTile().addRandomTile()
+		n = 0
+		while not state.gameOver():
+			for a in 'ULRD':
+				if a in state.actions():
+					break
+			state, _ = state.result(a)
+			n += 1
+			if n % every == 0 and state.emptyCount():
+				boards.append(state.pack())
+	return boards
+
+def deepcopyChild(state, t, v):
+	# How addTile() built each chance child before it stopped deep-copying
+	# the whole board, kept as the baseline for that change. The rng is
+	# shared, as boards had none to copy back then.
+	g = copy.deepcopy(state, {id(state._rng): state._rng})
+	if isinstance(g, Game2048):
+		g._board[t] = v
+	else:
+		g._board |= v << (60 - 4*t)
+	return g
+
+def operations(boards):
+	# Name and per-board callable of every primitive, with any argument it
+	# needs worked out beforehand so only the primitive itself is timed
+	ops = []
+	for a in 'UDLR':
+		ops.append((f'move {a}', [ (lambda b=b, a=a: b.move(a)) for b in boards ]))
+	ops.append(('actions', [ b.actions for b in boards ]))
+	ops.append(('gameOver', [ b.gameOver for b in boards ]))
+	ops.append(('possibleTiles', [ b.possibleTiles for b in boards ]))
+	ops.append(('addTile', [ (lambda b=b, t=b.possibleTiles()[0]: b.addTile(*t)) for b in boards ]))
+	ops.append(('addTile (deepcopy)', [ (lambda b=b, t=b.possibleTiles()[0]: deepcopyChild(b, *t)) for b in boards ]))
+	ops.append(('symmetries', [ b.symmetries for b in boards ]))
+	ops.append(('toInt', [ b.toInt for b in boards ]))
+	ops.append(('result', [ (lambda b=b, a=b.actions()[0]: b.result(a)) for b in boards ]))
+	return ops
+
+def opsPerSecond(calls, repeat=5, minTime=.2):
+	def run():
+		for f in calls:
+			f()
+	number = 1
+	while timeit.timeit(run, number=number) < minTime:
+		number *= 2
+	best = min(timeit.repeat(run, number=number, repeat=repeat))
+	return number * len(calls) / best
+
+def allocationsPerOp(calls):
+	# Memory blocks and bytes still held by the results of one op, found by
+	# keeping every result alive while counting
+	results = [None] * len(calls)
+	blocks = sys.getallocatedblocks()
+	for i, f in enumerate(calls):
+		results[i] = f()
+	blocks = sys.getallocatedblocks() - blocks
+
+	results = [None] * len(calls)
+	tracemalloc.start()
+	start, _ = tracemalloc.get_traced_memory()
+	for i, f in enumerate(calls):
+		results[i] = f()
+	size, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return blocks / len(calls), (size - start) / len(calls)
+
+def benchmark(game, boards):
+	games = [ b.unpack(game) for b in boards ]
+	for g, b in zip(games, boards):
+		g._rng = random.Random(b.toInt())
+	results = {}
+	for name, calls in operations(games):
+		blocks, size = allocationsPerOp(calls)
+		results[name] = {'opsPerSecond': opsPerSecond(calls), 'blocksPerOp': blocks, 'bytesPerOp': size}
+	return results
+
+def report(results, baseline=None, tolerance=.1):
+	# Prints one line per op and returns the names of ops that ran more than
+	# tolerance slower than the baseline
+	slower = []
+	for name, r in results.items():
+		line = f'{name:18} {r["opsPerSecond"]:12,.0f} ops/s {r["blocksPerOp"]:6.1f} blocks/op {r["bytesPerOp"]:8.1f} bytes/op'
+		if baseline and name in baseline:
+			ratio = r['opsPerSecond'] / baseline[name]['opsPerSecond']
+			line += f'   {ratio:5.2f}x baseline'
+			if ratio < 1 - tolerance:
+				line += '  SLOWER'
+				slower.append(name)
+		print(line)
+	return slower
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark the 2048 engine primitives')
+	parser.add_argument('--backend', choices=BACKENDS, default='game', help="board class to time")
+	parser.add_argument('--save', type=str, help="write the results to this JSON file")
+	parser.add_argument('--compare', type=str, help="JSON file of earlier results to compare with")
+	parser.add_argument('--tolerance', type=float, default=.1, help="slowdown that counts as a regression")
+	args = parser.parse_args()
+
+	boards = corpus()
+	print(f'{BACKENDS[args.backend].__name__} on {len(boards)} boards, Python {platform.python_version()}')
+
+	baseline = None
+	if args.compare:
+		with open(args.compare) as f:
+			saved = json.load(f)
+		if saved['backend'] != args.backend:
+			print(f'Warning: the baseline was run on the {saved["backend"]} backend')
+		baseline = saved['results']
+
+	results = benchmark(BACKENDS[args.backend], boards)
+	slower = report(results, baseline, args.tolerance)
+
+	if args.save:
+		with open(args.save, 'w') as f:
+			json.dump({'backend': args.backend, 'python': platform.python_version(), 'boards': len(boards), 'results': results}, f, indent=1)
+
+	if slower:
+		sys.exit(1)
@@ -0,0 +1,118 @@
+import mmap
+import struct
+
+from Game2048 import *
+
+# A board file is a plain sequence of 12-byte records with no header: the
+# packed board (the toInt() encoding) as a little-endian 64-bit integer,
+# followed by the score as a little-endian 32-bit integer.
+RECORD = struct.Struct('<QI')
+
+def _packRecord(board):
+	x = board.toInt()
+	if x >> 64:
+		raise ValueError('A board with a tile above 32768 does not fit in a record')
+	return RECORD.pack(x, board.getScore())
+
+class BoardWriter:
+	def __init__(self, file):
+		# file is a filename or a binary file object opened for writing
+		if isinstance(file, str):
+			self._file = open(file, 'wb')
+			self._ownsFile = True
+		else:
+			self._file = file
+			self._ownsFile = False
+
+	def write(self, board):
+		# board is anything with toInt() and getScore(), e.g. a Game2048,
+		# a Bitboard2048 or a PackedBoard
+		self._file.write(_packRecord(board))
+
+	def writeAll(self, boards):
+		self._file.write(b''.join([ _packRecord(b) for b in boards ]))
+
+	def close(self):
+		if self._ownsFile:
+			self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class BoardReader:
+	def __init__(self, file, chunkSize=4096):
+		# file is a filename or a binary file object opened for reading
+		if isinstance(file, str):
+			self._file = open(file, 'rb')
+			self._ownsFile = True
+		else:
+			self._file = file
+			self._ownsFile = False
+		self._chunkSize = chunkSize
+
+	def __iter__(self):
+		# Yields a PackedBoard per record, reading chunkSize records at a time.
+		# A raw stream may return fewer bytes than asked for, so a chunk that
+		# ends inside a record is completed by further reads.
+		while True:
+			chunk = self._file.read(RECORD.size * self._chunkSize)
+			if not chunk:
+				return
+			while len(chunk) % RECORD.size:
+				more = self._file.read(RECORD.size - len(chunk) % RECORD.size)
+				if not more:
+					raise ValueError('Board file ends in a partial record')
+				chunk += more
+			for board, score in RECORD.iter_unpack(chunk):
+				yield PackedBoard(board, score)
+
+	def close(self):
+		if self._ownsFile:
+			self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+class MappedBoards:
+	# Random access to the records of a board file, read straight from an mmap
+	def __init__(self, filename):
+		with open(filename, 'rb') as f:
+			try:
+				self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+			except ValueError:
+				# An empty file cannot be mapped
+				self._map = b''
+
+		if len(self._map) % RECORD.size:
+			raise ValueError('Board file ends in a partial record')
+
+	def __len__(self):
+		return len(self._map) // RECORD.size
+
+	def __getitem__(self, i):
+		if i < 0:
+			i += len(self)
+		if not 0 <= i < len(self):
+			raise IndexError('board index out of range')
+		board, score = RECORD.unpack_from(self._map, i * RECORD.size)
+		return PackedBoard(board, score)
+
+	def __iter__(self):
+		for board, score in RECORD.iter_unpack(self._map):
+			yield PackedBoard(board, score)
+
+	def close(self):
+		if isinstance(self._map, mmap.mmap):
+			self._map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
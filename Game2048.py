@@ -1,10 +1,226 @@
 import time
 import random
-import copy
 import array
+import operator
+
+def _moveRowLeft(row):
+	# Slide and merge a 16-bit packed row towards its highest nibble.
+	# A nibble cannot hold 65536, so two 32768 tiles are never merged.
+	compressed = [ row >> s & 15 for s in (12, 8, 4, 0) if row >> s & 15 ]
+	score = 0
+	j = 0
+	r = []
+	while j < len(compressed):
+		if j < len(compressed)-1 and compressed[j] == compressed[j+1] and compressed[j] < 15:
+			score += 2 << compressed[j]
+			r.append(compressed[j]+1)
+			j += 2
+		else:
+			r.append(compressed[j])
+			j += 1
+	r = r + [0] * (4-len(r))
+	return r[0] << 12 | r[1] << 8 | r[2] << 4 | r[3], score
+
+def _reverseRow(row):
+	return (row & 15) << 12 | (row >> 4 & 15) << 8 | (row >> 8 & 15) << 4 | row >> 12
+
+def _buildRowTables():
+	left = array.array('H', [0]*65536)
+	right = array.array('H', [0]*65536)
+	score = array.array('I', [0]*65536)
+	for row in range(65536):
+		left[row], score[row] = _moveRowLeft(row)
+		right[_reverseRow(row)] = _reverseRow(left[row])
+	return left, right, score
+
+def _unpackColumn(row):
+	# Spread a 16-bit packed row over the rightmost column of a board
+	return (row >> 12) << 48 | (row >> 8 & 15) << 32 | (row >> 4 & 15) << 16 | row & 15
+
+def _buildColumnTables():
+	up = array.array('Q', [0]*65536)
+	down = array.array('Q', [0]*65536)
+	for row in range(65536):
+		up[row] = _unpackColumn(_ROW_LEFT[row]) ^ _unpackColumn(row)
+		down[row] = _unpackColumn(_ROW_RIGHT[row]) ^ _unpackColumn(row)
+	return up, down
+
+# Result of sliding every 16-bit packed row left and right, and the score
+# gained (which is the same in both directions)
+_ROW_LEFT, _ROW_RIGHT, _ROW_SCORE = _buildRowTables()
+
+# The same moves applied to a column, stored as the bits that change when
+# the column is the rightmost one of the board
+_COL_UP, _COL_DOWN = _buildColumnTables()
+
+# Bit 0 is set if a packed row can slide left, bit 1 if it can slide right
+_ROW_LEGAL = array.array('B', [ (_ROW_LEFT[r] != r) | (_ROW_RIGHT[r] != r) << 1 for r in range(65536) ])
+
+# Action strings for every legal move mask, bits 0 to 3 standing for U, D, L and R
+_MASK_ACTIONS = tuple(''.join([ a for k, a in enumerate('UDLR') if m >> k & 1 ]) for m in range(16))
+
+# Translation tables between tile exponents and the hex digits of a packed
+# board, so packing and unpacking are a format() or int() call
+_EXP_TO_HEX = bytes.maketrans(bytes(range(16)), b'0123456789abcdef')
+_HEX_TO_EXP = bytes.maketrans(b'0123456789abcdef', bytes(range(16)))
+
+# A board with a tile above 32768 is packed a byte per tile instead, with
+# this bit set so it can never collide with a nibble-packed board
+_WIDE = 1 << 128
+
+# A spawned tile is a 4 with this probability, otherwise a 2
+_FOUR_PROBABILITY = .25
+
+# Exponent and probability of every tile the opponent can spawn
+_SPAWN_PROBABILITIES = ((1, 1 - _FOUR_PROBABILITY), (2, _FOUR_PROBABILITY))
+
+# Tile distribution used by randomize()
+_RANDOM_TILES = (0,)*16 + (1,)*4 + (2,)*2 + (3,)
+
+# Pairs of horizontally and vertically adjacent tile indices
+_NEIGHBOURS = tuple((i, i+1) for i in range(16) if i % 4 < 3) + tuple((i, i+4) for i in range(12))
+
+def _slideLines(board, lines, s):
+	# Slides and merges the tiles of every line in place and returns the new score
+	if max(board) < 15:
+		# Every line fits in the packed tables, so each one is a single lookup
+		for i, j, k, l in lines:
+			line = board[i] << 12 | board[j] << 8 | board[k] << 4 | board[l]
+			s += _ROW_SCORE[line]
+			line = _ROW_LEFT[line]
+			board[i] = line >> 12
+			board[j] = line >> 8 & 15
+			board[k] = line >> 4 & 15
+			board[l] = line & 15
+	else:
+		# Only the lines the tables cannot slide exactly take the slow path
+		for i, j, k, l in lines:
+			a, b, c, d = board[i], board[j], board[k], board[l]
+			if _fitsTables(a, b, c, d):
+				line = a << 12 | b << 8 | c << 4 | d
+				s += _ROW_SCORE[line]
+				line = _ROW_LEFT[line]
+				board[i] = line >> 12
+				board[j] = line >> 8 & 15
+				board[k] = line >> 4 & 15
+				board[l] = line & 15
+			else:
+				r, score = _slideLine((a, b, c, d))
+				s += score
+				board[i], board[j], board[k], board[l] = r
+	return s
+
+def _fitsTables(a, b, c, d):
+	# True when the packed tables slide the line exactly: no tile above 32768,
+	# and no two 32768 tiles that would meet and merge
+	m = max(a, b, c, d)
+	if m < 15:
+		return True
+	if m > 15:
+		return False
+	tiles = [t for t in (a, b, c, d) if t]
+	return all(x != 15 or y != 15 for x, y in zip(tiles, tiles[1:]))
+
+def _slideLine(tiles):
+	# Slides and merges one line towards its first tile with no cap on the
+	# exponents, returning the new tiles and the score gained
+	compressed = [t for t in tiles if t != 0]
+	score = 0
+	j = 0
+	r = []
+	while j < len(compressed):
+		if j < len(compressed)-1 and compressed[j] == compressed[j+1]:
+			score += 2 << compressed[j]
+			r.append(compressed[j]+1)
+			j += 2
+		else:
+			r.append(compressed[j])
+			j += 1
+	return r + [0] * (4-len(r)), score
+
+# Tile indices of every row or column, ordered in the direction of a move
+_LINES = {
+	'L': tuple((i, i+1, i+2, i+3) for i in range(0,16,4)),
+	'R': tuple((i+3, i+2, i+1, i) for i in range(0,16,4)),
+	'U': tuple((i, i+4, i+8, i+12) for i in range(4)),
+	'D': tuple((i+12, i+8, i+4, i) for i in range(4)),
+}
+
+def _buildPermutations():
+	# For every transformation, the index each tile of the new board comes from
+	flip = [ 4*(t % 4) + t // 4 for t in range(16) ]
+	rotations = [
+		list(range(16)),
+		[ 4*(3 - t % 4) + t // 4 for t in range(16) ],
+		[ 15 - t for t in range(16) ],
+		[ 4*(t % 4) + 3 - t // 4 for t in range(16) ],
+	]
+	symmetries = [ p for r in rotations for p in (r, [ flip[i] for i in r ]) ]
+	return (operator.itemgetter(*flip),
+		tuple(operator.itemgetter(*p) for p in rotations),
+		tuple(operator.itemgetter(*p) for p in symmetries))
+
+# Tile permutations for flip(), rotate() and symmetries(), each returning the
+# tiles of the transformed board
+_FLIP, _ROTATIONS, _SYMMETRIES = _buildPermutations()
+
+def _transpose(x):
+	a = x & 0xF0F00F0FF0F00F0F | (x & 0x0000F0F00000F0F0) << 12 | (x & 0x0F0F00000F0F0000) >> 12
+	return a & 0xFF00FF0000FF00FF | (a & 0x00FF00FF00000000) >> 24 | (a & 0x00000000FF00FF00) << 24
+
+def _mirrorRows(x):
+	# Reverse the order of the tiles inside every row
+	x = (x & 0xFF00FF00FF00FF00) >> 8 | (x & 0x00FF00FF00FF00FF) << 8
+	return (x & 0xF0F0F0F0F0F0F0F0) >> 4 | (x & 0x0F0F0F0F0F0F0F0F) << 4
+
+def _mirrorColumns(x):
+	# Reverse the order of the rows
+	return (x & 0xFFFF) << 48 | (x >> 16 & 0xFFFF) << 32 | (x >> 32 & 0xFFFF) << 16 | x >> 48
+
+def _emptyNibbles(x):
+	# The lowest bit of every empty nibble of a packed board
+	x |= x >> 1
+	x |= x >> 2
+	return ~x & 0x1111111111111111
+
+def _packedSymmetries(x):
+	# The eight rotations and reflections of a packed board, in the order of
+	# Game2048.symmetries(): each rotation of the board, then of its flip
+	t = _transpose(x)
+	c = _mirrorColumns(x)
+	ct = _mirrorColumns(t)
+	return [ x, t, _mirrorRows(t), _mirrorRows(x), _mirrorRows(c), _mirrorRows(ct), ct, c ]
+
+def _movePacked(b, action):
+	# Returns the packed board after the move and the score gained
+	if action == 'L' or action == 'R':
+		if action == 'L':
+			table = _ROW_LEFT
+		else:
+			table = _ROW_RIGHT
+		r0 = b >> 48
+		r1 = b >> 32 & 0xFFFF
+		r2 = b >> 16 & 0xFFFF
+		r3 = b & 0xFFFF
+		board = table[r0] << 48 | table[r1] << 32 | table[r2] << 16 | table[r3]
+	else:
+		if action == 'U':
+			table = _COL_UP
+		else:
+			table = _COL_DOWN
+		# Row i of the transpose is column i of the board
+		t = _transpose(b)
+		r0 = t >> 48
+		r1 = t >> 32 & 0xFFFF
+		r2 = t >> 16 & 0xFFFF
+		r3 = t & 0xFFFF
+		board = b ^ table[r0] << 12 ^ table[r1] << 8 ^ table[r2] << 4 ^ table[r3]
+	return board, _ROW_SCORE[r0] + _ROW_SCORE[r1] + _ROW_SCORE[r2] + _ROW_SCORE[r3]
 
 class Game2048:
-	def __init__(self, b=None, s=None, randomize=False):
+	__slots__ = ('_board', '_score', '_stack', '_rng', '_buffer')
+
+	def __init__(self, b=None, s=None, randomize=False, rng=None):
 		if b:
 			self._board = array.array('b', b)
 		else:
@@ -14,42 +230,107 @@ class Game2048:
 			self._score = s
 		else:
 			self._score = 0
+
+		self._stack = None
+		self._buffer = None
+
+		# Any object with the random module's interface, e.g. random.Random(seed).
+		# None stands for the random module itself, which cannot be pickled.
+		self._rng = rng
 			
 		if randomize: self.randomize()
 		
 	def randomize(self):
-		self._board = []
-		for i in range(16):
-			self._board.append(random.choice([0]*16 + [1]*4 + [2]*2 + [3]))
+		rng = self._rng or random
+		self._board = array.array('b', [ rng.choice(_RANDOM_TILES) for i in range(16) ])
+
+	@classmethod
+	def fromBuffer(cls, buf, s=None, rng=None):
+		# Builds a board on top of 16 tile bytes without copying them. The board
+		# never writes to them: pushMove() and pushTile() switch to a private
+		# copy first. bytes, bytearray and byte arrays are used as they are, as
+		# is a memoryview of a whole one. Any other buffer of bytes is copied
+		# once, since the board needs their count() and index().
+		if isinstance(buf, array.array):
+			if buf.typecode not in 'bB':
+				raise ValueError('fromBuffer() needs one byte per tile')
+		elif not isinstance(buf, (bytes, bytearray)):
+			view = memoryview(buf)
+			if view.itemsize != 1:
+				raise ValueError('fromBuffer() needs one byte per tile')
+			obj = view.obj
+			if (isinstance(obj, (bytes, bytearray)) or isinstance(obj, array.array) and obj.typecode in 'bB') \
+					and view.nbytes == memoryview(obj).nbytes:
+				buf = obj
+			else:
+				buf = bytes(view)
+		if len(buf) != 16:
+			raise ValueError('fromBuffer() needs 16 tiles')
+		g = cls(None, s, rng=rng)
+		g._board = buf
+		g._buffer = buf
+		return g
 
 	def getBoard(self):
 		return self._board
 
+	def getBuffer(self):
+		# Read-only view of the 16 tile bytes, e.g. for np.frombuffer(b, np.int8)
+		return memoryview(self._board).toreadonly()
+
 	def actions(self):
-		return ''.join([ a for a in 'UDLR' if self.move(a)._board != self._board ])
+		return _MASK_ACTIONS[self.actionMask()]
+
+	def actionMask(self):
+		b = self._board
+		if max(b) >= 15:
+			# Ask the tables about every line they can slide exactly, and
+			# slide the others
+			mask = 0
+			for k, a in enumerate('UDLR'):
+				for line in _LINES[a]:
+					tiles = [ b[i] for i in line ]
+					if _fitsTables(*tiles):
+						legal = _ROW_LEGAL[tiles[0] << 12 | tiles[1] << 8 | tiles[2] << 4 | tiles[3]] & 1
+					else:
+						legal = _slideLine(tiles)[0] != tiles
+					if legal:
+						mask |= 1 << k
+						break
+			return mask
+
+		rows = _ROW_LEGAL[b[0] << 12 | b[1] << 8 | b[2] << 4 | b[3]] \
+			| _ROW_LEGAL[b[4] << 12 | b[5] << 8 | b[6] << 4 | b[7]] \
+			| _ROW_LEGAL[b[8] << 12 | b[9] << 8 | b[10] << 4 | b[11]] \
+			| _ROW_LEGAL[b[12] << 12 | b[13] << 8 | b[14] << 4 | b[15]]
+		columns = _ROW_LEGAL[b[0] << 12 | b[4] << 8 | b[8] << 4 | b[12]] \
+			| _ROW_LEGAL[b[1] << 12 | b[5] << 8 | b[9] << 4 | b[13]] \
+			| _ROW_LEGAL[b[2] << 12 | b[6] << 8 | b[10] << 4 | b[14]] \
+			| _ROW_LEGAL[b[3] << 12 | b[7] << 8 | b[11] << 4 | b[15]]
+		return rows << 2 | columns
 
 	def result(self, a):
-		s = self._score
 		g = self.move(a)
-		zeros = [ i for i in range(16) if g._board[i] == 0 ]
-		i = random.choice(zeros)
-		if random.randint(0,3) == 3:
-			g._board[i] = 2
-		else:
-			g._board[i] = 1
-			
-		return g, g._score - s
+		g._spawnTile()
+		return g, g._score - self._score
 		
 	def addRandomTile(self):		
-		g = copy.deepcopy(self)
-		zeros = [ i for i in range(16) if g._board[i] == 0 ]
-		i = random.choice(zeros)
-		if random.randint(0,3) == 3:
-			g._board[i] = 2
-		else:
-			g._board[i] = 1
-			
+		g = Game2048(self._board, self._score, rng=self._rng)
+		g._spawnTile()
 		return g
+
+	def _spawnTile(self):
+		# Places a 2, or a 4 with probability _FOUR_PROBABILITY, on a uniformly
+		# chosen empty tile
+		rng = self._rng or random
+		b = self._board
+		i = b.index(0)
+		for _ in range(rng.randrange(b.count(0))):
+			i = b.index(0, i+1)
+		if rng.random() < _FOUR_PROBABILITY:
+			b[i] = 2
+		else:
+			b[i] = 1
 		
 	def getScore(self):
 		return self._score
@@ -58,128 +339,440 @@ class Game2048:
 		return self._board[4*r+c]
 
 	def possibleResults(self, a):
-		possible = []
+		# Yields every board the opponent can produce after the move, one at a time
 		moved = self.move(a)
 		r = moved.getScore() - self.getScore()
-		zeros = [ i for i in range(16) if moved._board[i] == 0 ]
-		for i in zeros:
-			g = copy.deepcopy(moved)
-			for t in [1,2]:
-				g._board[i] = t
-				if t == 1:
-					possible.append((g,r,.75/len(zeros)))
-				else:
-					possible.append((g,r,.25/len(zeros)))
+		b = moved._board
+		n = b.count(0)
+		i = -1
+		for _ in range(n):
+			i = b.index(0, i+1)
+			for v, p in _SPAWN_PROBABILITIES:
+				yield (moved.addTile(i, v), r, p/n)
 			
-		return possible
-		
 	def possibleTiles(self):
 		possible = []
-		zeros = [ i for i in range(16) if self._board[i] == 0 ]
-		for i in zeros:
-			for t in [1,2]:
-				possible.append((i,t))
+		b = self._board
+		i = -1
+		for _ in range(b.count(0)):
+			i = b.index(0, i+1)
+			possible.append((i,1))
+			possible.append((i,2))
 			
 		return possible
+
+	def possibleSpawns(self):
+		# Every (tile, value, probability) the opponent can play, in the order
+		# of possibleTiles(), with the probabilities summing to one
+		possible = []
+		b = self._board
+		n = b.count(0)
+		if n == 0:
+			return possible
+		spawns = [ (v, p/n) for v, p in _SPAWN_PROBABILITIES ]
+		i = -1
+		for _ in range(n):
+			i = b.index(0, i+1)
+			for v, p in spawns:
+				possible.append((i, v, p))
+
+		return possible
+
+	def emptyMask(self):
+		# Bit 15-i is set when tile i is empty, the order tiles have in toInt()
+		b = self._board
+		m = 0
+		i = -1
+		for _ in range(b.count(0)):
+			i = b.index(0, i+1)
+			m |= 1 << (15-i)
+		return m
+
+	def emptyCount(self):
+		return self._board.count(0)
 		
 	def addTile(self, t, v):
-		g = copy.deepcopy(self)
+		g = Game2048(self._board, self._score, rng=self._rng)
 		g._board[t] = v
 		return g
 
 	def move(self, action):
-		board = []
-		s = self._score
-		if action == 'R':
-			for i in range(0,16,4):
-				compressed = [t for t in self._board[i:i+4] if t != 0]
-				j = len(compressed) - 1
-				r = []
-				while j >= 0:
-					if j > 0 and compressed[j] == compressed[j-1]:
-						s += 2*(2**compressed[j])
-						r.insert(0,compressed[j]+1)
-						j -= 2
-					else:
-						r.insert(0,compressed[j])
-						j -= 1
-				r = [0] * (4-len(r)) + r					
-				board.extend(r)
-			return Game2048(board, s)
-		elif action == 'L':
-			for i in range(0,16,4):
-				compressed = [t for t in self._board[i:i+4] if t != 0]
-				j = 0
-				r = []
-				while j < len(compressed):
-					if j < len(compressed)-1 and compressed[j] == compressed[j+1]:
-						s += 2*(2**compressed[j])
-						r.append(compressed[j]+1)
-						j += 2
-					else:
-						r.append(compressed[j])
-						j += 1
-				r = r + [0] * (4-len(r))					
-				board.extend(r)
-			return Game2048(board, s)
-		elif action == 'D':
-			return self.flip().move('R').flip()
-		elif action == 'U':
-			return self.flip().move('L').flip()
-		else:
+		if action not in _LINES:
 			print('ERROR move =', action)
+			return
+
+		g = Game2048(self._board, self._score, rng=self._rng)
+		g._score = _slideLines(g._board, _LINES[action], g._score)
+		return g
+
+	def reward(self, action):
+		# The score the move gains, looked up without building the new board
+		b = self._board
+		s = 0
+		if max(b) < 15:
+			for i, j, k, l in _LINES[action]:
+				s += _ROW_SCORE[b[i] << 12 | b[j] << 8 | b[k] << 4 | b[l]]
+			return s
+		for i, j, k, l in _LINES[action]:
+			if _fitsTables(b[i], b[j], b[k], b[l]):
+				s += _ROW_SCORE[b[i] << 12 | b[j] << 8 | b[k] << 4 | b[l]]
+			else:
+				s += _slideLine((b[i], b[j], b[k], b[l]))[1]
+		return s
+
+	def pushMove(self, action):
+		# Plays the move on this board itself, so a search can undo it with pop()
+		if self._stack is None:
+			self._stack = []
+		self._stack.append((self._board, self._score))
+		self._board = array.array('b', self._board)
+		self._score = _slideLines(self._board, _LINES[action], self._score)
+
+	def pushTile(self, t, v):
+		if self._stack is None:
+			self._stack = []
+		if type(self._board) is not array.array or self._board is self._buffer:
+			# Never write to the caller's buffer
+			self._board = array.array('b', self._board)
+		self._stack.append((t, self._board[t]))
+		self._board[t] = v
+
+	def pop(self):
+		# Undoes the last pushMove() or pushTile()
+		a, b = self._stack.pop()
+		if type(a) is int:
+			self._board[a] = b
+		else:
+			self._board = a
+			self._score = b
 				
 	def flip(self):
-		r = []
-		for i in range(4):
-			r.extend( self._board[i:16:4] )
-		return Game2048(r, self._score)
+		return Game2048(_FLIP(self._board), self._score)
 		
+	def rotate(self, numRotations):
+		return Game2048(_ROTATIONS[numRotations % 4](self._board), self._score)
+			
+	def symmetries(self):
+		b = self._board
+		return [ Game2048(symmetry(b), self._score) for symmetry in _SYMMETRIES ]
+
+	def symmetryInts(self):
+		x = self.toInt()
+		if x >= _WIDE:
+			return [ _WIDE | int.from_bytes(bytes(symmetry(self._board)), 'big') for symmetry in _SYMMETRIES ]
+		return _packedSymmetries(x)
+
+	def canonical(self):
+		# The same packed int for all eight rotations and reflections of a board
+		return min(self.symmetryInts())
+			
+	def gameOver(self):
+		b = self._board
+		if 0 in b:
+			# Some tile can slide into an empty tile unless the board is empty
+			return max(b) == 0
+		for i, j in _NEIGHBOURS:
+			if b[i] == b[j]:
+				return False
+		return True
+
+	@classmethod
+	def fromInt(cls, packed, s=None, rng=None):
+		# The inverse of toInt(): each hex digit of the packed int is one tile
+		if packed >= _WIDE:
+			return cls((packed - _WIDE).to_bytes(16, 'big'), s, rng=rng)
+		return cls(format(packed, '016x').encode().translate(_HEX_TO_EXP), s, rng=rng)
+
+	def toInt(self):
+		try:
+			return int(bytes(self._board).translate(_EXP_TO_HEX), 16)
+		except ValueError:
+			# A tile above 32768 does not fit in a hex digit
+			return _WIDE | int.from_bytes(bytes(self._board), 'big')
+
+	def pack(self):
+		return PackedBoard(self.toInt(), self._score)
+
+	def __str__(self):
+		s = ''
+		for r in range(0,16,4):
+			s += ' '.join(f'{2**x} '.rjust(5) for x in self._board[r:r+4]).replace(' 1 ','   ') + '\n'
+		s += f'Score = {self._score}'
+		return s
+		
+class Bitboard2048:
+	# Same interface as Game2048, but the 16 exponents are packed into a
+	# single 64-bit integer using the toInt() encoding (tile 0 in the
+	# highest nibble, tile 15 in the lowest). Tiles stop at 32768, so
+	# games that go further need Game2048.
+	__slots__ = ('_board', '_score', '_stack', '_rng')
+
+	def __init__(self, b=None, s=None, randomize=False, rng=None):
+		if isinstance(b, int):
+			self._board = b
+		elif b:
+			self._board = int(bytes(b).translate(_EXP_TO_HEX), 16)
+		else:
+			self._board = 0
+
+		if s:
+			self._score = s
+		else:
+			self._score = 0
+
+		self._stack = None
+
+		self._rng = rng
+
+		if randomize: self.randomize()
+
+	def randomize(self):
+		rng = self._rng or random
+		self._board = 0
+		for i in range(16):
+			self._board = 16*self._board + rng.choice(_RANDOM_TILES)
+
+	@classmethod
+	def fromInt(cls, packed, s=None, rng=None):
+		if packed >= _WIDE:
+			raise ValueError('Bitboard2048 cannot hold a tile above 32768, use Game2048')
+		return cls(packed, s, rng=rng)
+
+	def getBoard(self):
+		return array.array('b', format(self._board, '016x').encode().translate(_HEX_TO_EXP))
+
+	def getBuffer(self):
+		# The tiles are packed, so this view is over a freshly unpacked array
+		return memoryview(self.getBoard()).toreadonly()
+
+	def actions(self):
+		return _MASK_ACTIONS[self.actionMask()]
+
+	def actionMask(self):
+		b = self._board
+		t = _transpose(b)
+		rows = _ROW_LEGAL[b >> 48] | _ROW_LEGAL[b >> 32 & 0xFFFF] | _ROW_LEGAL[b >> 16 & 0xFFFF] | _ROW_LEGAL[b & 0xFFFF]
+		columns = _ROW_LEGAL[t >> 48] | _ROW_LEGAL[t >> 32 & 0xFFFF] | _ROW_LEGAL[t >> 16 & 0xFFFF] | _ROW_LEGAL[t & 0xFFFF]
+		return rows << 2 | columns
+
+	def result(self, a):
+		g = self.move(a)
+		g._spawnTile()
+		return g, g._score - self._score
+
+	def addRandomTile(self):
+		g = Bitboard2048(self._board, self._score, rng=self._rng)
+		g._spawnTile()
+		return g
+
+	def _spawnTile(self):
+		# Picks the k-th empty tile, counted from tile 0 as in Game2048, by
+		# clearing the lowest set bits of the empty tile mask (one bit per
+		# empty nibble) until that tile's bit is the lowest one left
+		rng = self._rng or random
+		b = self._board
+		empty = _emptyNibbles(b)
+		n = empty.bit_count()
+		for _ in range(n - 1 - rng.randrange(n)):
+			empty &= empty - 1
+		bit = empty & -empty
+		if rng.random() < _FOUR_PROBABILITY:
+			self._board = b | bit << 1
+		else:
+			self._board = b | bit
+
+	def getScore(self):
+		return self._score
+
+	def getTile(self, r, c):
+		return self._board >> (60 - 16*r - 4*c) & 15
+
+	def possibleResults(self, a):
+		moved = self.move(a)
+		r = moved._score - self._score
+		b = moved._board
+		empty = _emptyNibbles(b)
+		n = empty.bit_count()
+		while empty:
+			shift = empty.bit_length() - 1
+			empty ^= 1 << shift
+			for v, p in _SPAWN_PROBABILITIES:
+				yield (Bitboard2048(b | v << shift, moved._score, rng=self._rng), r, p/n)
+
+	def possibleTiles(self):
+		possible = []
+		empty = _emptyNibbles(self._board)
+		while empty:
+			shift = empty.bit_length() - 1
+			empty ^= 1 << shift
+			i = 15 - shift // 4
+			possible.append((i,1))
+			possible.append((i,2))
+
+		return possible
+
+	def possibleSpawns(self):
+		possible = []
+		empty = _emptyNibbles(self._board)
+		n = empty.bit_count()
+		if n == 0:
+			return possible
+		spawns = [ (v, p/n) for v, p in _SPAWN_PROBABILITIES ]
+		while empty:
+			shift = empty.bit_length() - 1
+			empty ^= 1 << shift
+			i = 15 - shift // 4
+			for v, p in spawns:
+				possible.append((i, v, p))
+
+		return possible
+
+	def emptyMask(self):
+		# Bit 15-i is set when tile i is empty, the order tiles have in toInt()
+		m = _emptyNibbles(self._board)
+		m = (m | m >> 3) & 0x0303030303030303
+		m = (m | m >> 6) & 0x000F000F000F000F
+		m = (m | m >> 12) & 0x000000FF000000FF
+		return (m | m >> 24) & 0xFFFF
+
+	def emptyCount(self):
+		return _emptyNibbles(self._board).bit_count()
+
+	def addTile(self, t, v):
+		shift = 60 - 4*t
+		return Bitboard2048(self._board & ~(15 << shift) | v << shift, self._score, rng=self._rng)
+
+	def move(self, action):
+		if action not in _LINES:
+			print('ERROR move =', action)
+			return
+
+		board, s = _movePacked(self._board, action)
+		return Bitboard2048(board, self._score + s, rng=self._rng)
+
+	def reward(self, action):
+		# The score the move gains, looked up without building the new board
+		b = self._board
+		if action == 'U' or action == 'D':
+			b = _transpose(b)
+		return _ROW_SCORE[b >> 48] + _ROW_SCORE[b >> 32 & 0xFFFF] + _ROW_SCORE[b >> 16 & 0xFFFF] + _ROW_SCORE[b & 0xFFFF]
+
+	def pushMove(self, action):
+		# Plays the move on this board itself, so a search can undo it with pop()
+		if self._stack is None:
+			self._stack = []
+		self._stack.append((self._board, self._score))
+		self._board, s = _movePacked(self._board, action)
+		self._score += s
+
+	def pushTile(self, t, v):
+		if self._stack is None:
+			self._stack = []
+		self._stack.append((self._board, self._score))
+		shift = 60 - 4*t
+		self._board = self._board & ~(15 << shift) | v << shift
+
+	def pop(self):
+		# Undoes the last pushMove() or pushTile()
+		self._board, self._score = self._stack.pop()
+
+	def flip(self):
+		return Bitboard2048(_transpose(self._board), self._score)
+
 	def rotate(self, numRotations):
 		numRotations = numRotations % 4
 		if numRotations == 0:
-			return Game2048(copy.copy(self._board), self._score)
-			
+			return Bitboard2048(self._board, self._score)
 		if numRotations == 1:
-			b = [0]*16
-			for r in range(4):
-				for c in range(4):
-					b[4*c + 3-r] = self._board[4*r+c]
-			return Game2048(b, self._score)
-			
+			return Bitboard2048(_mirrorRows(_transpose(self._board)), self._score)
 		if numRotations == 2:
-			b = [0]*16
-			for r in range(4):
-				for c in range(4):
-					b[4*(3-r) + 3-c] = self._board[4*r+c]
-			return Game2048(b, self._score)
-			
+			return Bitboard2048(_mirrorRows(_mirrorColumns(self._board)), self._score)
 		if numRotations == 3:
-			b = [0]*16
-			for r in range(4):
-				for c in range(4):
-					b[4*(3-c) + r] = self._board[4*r+c]
-			return Game2048(b, self._score)
-			
+			return Bitboard2048(_mirrorColumns(_transpose(self._board)), self._score)
+
 	def symmetries(self):
-		return [ b.rotate(i) for i in range(4) for b in [self, self.flip()] ]
-			
+		return [ Bitboard2048(x, self._score) for x in _packedSymmetries(self._board) ]
+
+	def symmetryInts(self):
+		return _packedSymmetries(self._board)
+
+	def canonical(self):
+		# The same packed int for all eight rotations and reflections of a board
+		return min(_packedSymmetries(self._board))
+
 	def gameOver(self):
-		return self.actions() == '' or 16 in self._board
+		b = self._board
+		if _emptyNibbles(b):
+			# Some tile can slide into an empty tile unless the board is empty
+			return b == 0
+
+		# Equal neighbours leave a zero nibble when the board is XORed with
+		# itself shifted by one tile to the right or one row down
+		h = b ^ b >> 4
+		h |= h >> 1
+		h |= h >> 2
+		v = b ^ b >> 16
+		v |= v >> 1
+		v |= v >> 2
+		if h & 0x0111011101110111 == 0x0111011101110111 and v & 0x0000111111111111 == 0x0000111111111111:
+			return True
+
+		if b & b >> 1 & b >> 2 & b >> 3 & 0x1111111111111111:
+			# Two 32768 tiles cannot merge in a nibble, so ask the tables
+			return self.actionMask() == 0
+		return False
 
 	def toInt(self):
-		i = 0
-		for v in self._board:
-			i = 16*i + v
-		return i
+		return self._board
+
+	def pack(self):
+		return PackedBoard(self._board, self._score)
 
 	def __str__(self):
 		s = ''
+		board = self.getBoard()
 		for r in range(0,16,4):
-			s += ' '.join(f'{2**x} '.rjust(5) for x in self._board[r:r+4]).replace(' 1 ','   ') + '\n'
+			s += ' '.join(f'{2**x} '.rjust(5) for x in board[r:r+4]).replace(' 1 ','   ') + '\n'
 		s += f'Score = {self._score}'
 		return s
-		
+
+class PackedBoard:
+	# An immutable, hashable snapshot of a board and its score, small enough to
+	# keep millions of them in caches and episode lists. Two snapshots are
+	# equal when their tiles are, whatever their scores.
+	__slots__ = ('_board', '_score')
+
+	def __init__(self, board, score=0):
+		object.__setattr__(self, '_board', board)
+		object.__setattr__(self, '_score', score)
+
+	def __setattr__(self, name, value):
+		raise AttributeError('PackedBoard is immutable')
+
+	def __reduce__(self):
+		return PackedBoard, (self._board, self._score)
+
+	def __eq__(self, other):
+		return isinstance(other, PackedBoard) and self._board == other._board
+
+	def __hash__(self):
+		return hash(self._board)
+
+	def __repr__(self):
+		return f'PackedBoard({self._board:#018x}, {self._score})'
+
+	def toInt(self):
+		return self._board
+
+	def getScore(self):
+		return self._score
+
+	def unpack(self, game=None):
+		# Without a class, a board with a tile above 32768 needs Game2048
+		if game is None:
+			game = Game2048 if self._board >= _WIDE else Bitboard2048
+		return game.fromInt(self._board, self._score)
+
 class BasePlayer:
 	def __init__(self, timeLimit):
 		self._timeLimit = timeLimit
@@ -56,15 +56,16 @@ class Graphics:
 		self.colors[15].setByName('black')
 
 	def draw(self, board):		
+		tiles = board.getBoard()
 		for i in range(16):
-			if board._board[i] > 0:
-				self._tiles[i].setFillColor(self.colors[board._board[i]])
-				self._numbers[i].setMessage(str(2**board._board[i]))
+			if tiles[i] > 0:
+				self._tiles[i].setFillColor(self.colors[min(tiles[i], 15)])
+				self._numbers[i].setMessage(str(2**tiles[i]))
 			else:
 				self._tiles[i].setFillColor('tan')
 				self._numbers[i].setMessage('')
 		
 		
-		self._score.setMessage(f'Score: {board._score}')
+		self._score.setMessage(f'Score: {board.getScore()}')
 
 		self._canvas.refresh()
@@ -10,12 +10,11 @@ class Player(BasePlayer):
 		bestMove = ''
 		
 		for a in board.actions():
-			avgScore = 0.
-			for (result, reward, prob) in board.possibleResults(a):
-				avgScore += prob*reward
+			# The tile the opponent adds afterwards does not change the reward
+			score = board.reward(a)
 
-			if avgScore > bestScore:
-				bestScore = avgScore
+			if score > bestScore:
+				bestScore = score
 				bestMove = a
 				
 		self.setMove(bestMove)
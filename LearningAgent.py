@@ -45,10 +45,9 @@ class Player(BasePlayer):
 
         for a in board.actions():
             # Finding the expected (or average) value of the state after the move is taken
-            v = 0
+            v = board.reward(a)
             for (result, reward, prob) in board.possibleResults(a):
-                v += prob * (
-                            reward + self._discountFactor * self.value(result))
+                v += prob * self._discountFactor * self.value(result)
 
             if v > bestValue:
                 bestValue = v
@@ -73,17 +72,20 @@ def tupleToIndex(t):
 
 
 def tableEntries(board):
+    # Each symmetry is a packed int, so the tuples are read straight from its
+    # nibbles: the first two rows and three 2x2 squares.
     entries = []
 
-    for s in board.symmetries():
-        entries.append(tupleToIndex(board.getBoard()[0:4]))
-        entries.append(tupleToIndex(board.getBoard()[4:8]) + 16 ** 4)
-        entries.append(tupleToIndex(
-            board.getBoard()[0:2] + board.getBoard()[4:6]) + 2 * 16 ** 4)
-        entries.append(tupleToIndex(
-            board.getBoard()[1:3] + board.getBoard()[5:7]) + 3 * 16 ** 4)
-        entries.append(tupleToIndex(
-            board.getBoard()[5:7] + board.getBoard()[9:11]) + 4 * 16 ** 4)
+    for x in board.symmetryInts():
+        if x >= 1 << 64:
+            # A tile above 32768 is packed a byte per tile and shares the
+            # table entries of 32768
+            x = int(''.join(format(min(t, 15), 'x') for t in x.to_bytes(17, 'big')[1:]), 16)
+        entries.append(x >> 48)
+        entries.append((x >> 32 & 0xFFFF) + 16 ** 4)
+        entries.append(((x >> 56 & 0xFF) << 8 | x >> 40 & 0xFF) + 2 * 16 ** 4)
+        entries.append(((x >> 52 & 0xFF) << 8 | x >> 36 & 0xFF) + 3 * 16 ** 4)
+        entries.append(((x >> 36 & 0xFF) << 8 | x >> 20 & 0xFF) + 4 * 16 ** 4)
 
     return entries
 
@@ -94,10 +96,9 @@ def bestAction(state):
 
     for a in state.actions():
         # Finding the expected (or average) value of the state after the move is taken
-        v = 0
+        v = state.reward(a)
         for (result, reward, prob) in state.possibleResults(a):
-            v += prob * (reward + sum(
-                valueTable[i] for i in tableEntries(result)))
+            v += prob * sum(valueTable[i] for i in tableEntries(result))
 
         if v > bestValue:
             bestValue = v
@@ -120,11 +121,14 @@ def simulateGame(params):
         length += 1
         maxTile = max(state.getBoard())
 
-        episodes.append((state, result, reward))
+        # Packed snapshots keep the episode memory small on long games
+        episodes.append((state.pack(), result.pack(), reward))
 
         state = result
 
-    for (state, result, reward) in episodes:
+    for (packedState, packedResult, reward) in episodes:
+        state = packedState.unpack(Game2048)
+        result = packedResult.unpack(Game2048)
         vState = sum(valueTable[i] for i in tableEntries(state))
         if not result.gameOver():
             vResult = sum(valueTable[i] for i in tableEntries(result))
@@ -1,8 +1,22 @@
 from Game2048 import *
+from TranspositionTable import TranspositionTable
+
+# ----- Heuristic Constants -----
+# upperBound() relies on these as well as heuristic()
+SNAKE_WEIGHTS \
+    = (2048, 1024, 512, 256, 64, 32, 16, 8, 4, 2, 1, 1, 1, 1, 1, 1)
+
+# ----- Tunable Component Weights -----
+CORNER_BONUS = 10000
+CORNER_PENALTY = -5000
+EMPTY_WEIGHT = 1000
+MONOTONICITY_WEIGHT = 3000
+MERGE_WEIGHT = 2000
+SMOOTHNESS_SCALE = 500
 
 
 class Player(BasePlayer):
-    def __init__(self, timeLimit):
+    def __init__(self, timeLimit, probabilityCutoff=0.0001, pruning=False):
         BasePlayer.__init__(self, timeLimit)
 
         self._nodeCount = 0
@@ -10,9 +24,24 @@ class Player(BasePlayer):
         self._childCount = 0
         self._depthCount = 0
         self._count = 0
+        self._cutoffCount = 0
+        self._pruneCount = 0
+
+        # Positions reached with a lower probability than this, counting every
+        # spawn on the way, are not searched any deeper
+        self._probabilityCutoff = probabilityCutoff
+
+        # Search with maxStar() and chanceStar() instead of maxPlayer() and
+        # chance(), which finds the same move while visiting fewer nodes
+        self._pruning = pruning
+
+        # Values of searched positions, less the score they were reached with,
+        # keyed by packed board with the low bit set for chance nodes
+        self._table = TranspositionTable()
 
     def findMove(self, state):
         self._count += 1
+        self._table.clear()
         actions = self.moveOrder(state)
         bestMove = None
         depth = 1
@@ -23,9 +52,14 @@ class Player(BasePlayer):
             print('Search depth', depth)
             best = float('-inf')
             for a in actions:
-                result = state.move(a)
                 if not self.timeRemaining(): return
-                v = self.chance(result, depth - 1)
+                state.pushMove(a)
+                if self._pruning:
+                    # Only a move worth more than the best so far matters
+                    v = self.chanceStar(state, depth - 1, best)
+                else:
+                    v = self.chance(state, depth - 1)
+                state.pop()
                 if v is None: return
                 if v > best:
                     best = v
@@ -36,7 +70,7 @@ class Player(BasePlayer):
 
             depth += 1
 
-    def maxPlayer(self, state, depth):
+    def maxPlayer(self, state, depth, probability=1):
         # The max player gets to choose the move
         self._nodeCount += 1
         self._childCount += 1
@@ -44,72 +78,213 @@ class Player(BasePlayer):
         if state.gameOver():
             return state.getScore()
 
-        actions = self.moveOrder(state)
+        key = state.toInt() << 1
+        score = state.getScore()
+        v = self._table.get(key, depth)
+        if v is not None:
+            return score + v
 
         if depth == 0:
-            return self.heuristic(state)
+            best = self.heuristic(state)
+        elif probability < self._probabilityCutoff:
+            # Stored as a depth 0 value, since that is all it is
+            self._cutoffCount += 1
+            best = self.heuristic(state)
+            depth = 0
+        else:
+            actions = self.moveOrder(state)
+
+            self._parentCount += 1
+            cutoffs = self._cutoffCount
+            best = float('-inf')
+            for a in actions:
+                if not self.timeRemaining(): return None
+                state.pushMove(a)
+                v = self.chance(state, depth - 1, probability)
+                state.pop()
+                if v is None: return None
+                if v > best:
+                    best = v
 
-        self._parentCount += 1
-        best = float('-inf')
-        for a in actions:
-            if not self.timeRemaining(): return None
-            result = state.move(a)
-            v = self.chance(result, depth - 1)
-            if v is None: return None
-            if v > best:
-                best = v
+            if self._cutoffCount != cutoffs:
+                # Part of the subtree stopped short at a probability cutoff,
+                # so this is not a full depth value and is not stored
+                return best
 
+        self._table.put(key, depth, best - score)
         return best
 
-    def chance(self, state, depth):
+    def chance(self, state, depth, probability=1):
         self._nodeCount += 1
         self._childCount += 1
 
         if state.gameOver():
             return state.getScore()
 
+        key = state.toInt() << 1 | 1
+        score = state.getScore()
+        value = self._table.get(key, depth)
+        if value is not None:
+            return score + value
+
         if depth == 0:
-            return self.heuristic(state)
+            value = self.heuristic(state)
+            self._table.put(key, depth, value - score)
+            return value
 
-        possibleTiles = state.possibleTiles()
+        possibleSpawns = state.possibleSpawns()
+        cutoffs = self._cutoffCount
         totalValue = 0
-        for (tile_pos, tile_value) in possibleTiles:
+        for (tile_pos, tile_value, p) in possibleSpawns:
             if not self.timeRemaining():
                 return None
-            result = state.addTile(tile_pos, tile_value)
-            if tile_value == 1:
-                probability = 0.9
-            else:
-                probability = 0.1
-            value = self.maxPlayer(result, depth - 1)
+            state.pushTile(tile_pos, tile_value)
+            value = self.maxPlayer(state, depth - 1, probability * p)
+            state.pop()
             if value is None:
                 return None
-            totalValue += probability * value
+            totalValue += p * value
+
+        if possibleSpawns:
+            if self._cutoffCount == cutoffs:
+                self._table.put(key, depth, totalValue - score)
+            return totalValue
+        else:
+            return self.heuristic(state)
+
+    def maxStar(self, state, depth, alpha, probability=1):
+        # maxPlayer() for a value that only matters above alpha: a result at
+        # or below alpha is just an upper bound on the value, and only exact
+        # values are stored
+        self._nodeCount += 1
+        self._childCount += 1
+
+        if state.gameOver():
+            return state.getScore()
 
-        if possibleTiles:
-            return totalValue / len(possibleTiles)
+        key = state.toInt() << 1
+        score = state.getScore()
+        v = self._table.get(key, depth, exact=True)
+        if v is not None:
+            return score + v
+
+        if depth == 0:
+            best = self.heuristic(state)
+        elif probability < self._probabilityCutoff:
+            self._cutoffCount += 1
+            best = self.heuristic(state)
+            depth = 0
         else:
-            self.heuristic(state)
+            actions = self.moveOrder(state)
+
+            self._parentCount += 1
+            cutoffs = self._cutoffCount
+            best = float('-inf')
+            for a in actions:
+                if not self.timeRemaining(): return None
+                state.pushMove(a)
+                v = self.chanceStar(state, depth - 1, max(alpha, best), probability)
+                state.pop()
+                if v is None: return None
+                if v > best:
+                    best = v
+
+            if best <= alpha or self._cutoffCount != cutoffs:
+                return best
+
+        self._table.put(key, depth, best - score)
+        return best
+
+    def chanceStar(self, state, depth, alpha, probability=1):
+        # chance() with Ballard's Star1 pruning. Every child value is at most
+        # upperBound(), so the children searched so far limit how high the
+        # rest can lift the expectation. Once it cannot rise above alpha the
+        # remaining children are skipped. With no min player there is never
+        # a finite beta, so the lower-bound cutoffs of Star1 and the probing
+        # of Star2 have nothing to cut.
+        self._nodeCount += 1
+        self._childCount += 1
+
+        if state.gameOver():
+            return state.getScore()
+
+        key = state.toInt() << 1 | 1
+        score = state.getScore()
+        value = self._table.get(key, depth, exact=True)
+        if value is not None:
+            return score + value
+
+        if depth == 0:
+            value = self.heuristic(state)
+            self._table.put(key, depth, value - score)
+            return value
+
+        possibleSpawns = state.possibleSpawns()
+        if not possibleSpawns:
+            return self.heuristic(state)
+
+        high = self.upperBound(state, depth)
+        cutoffs = self._cutoffCount
+
+        # Search the children in turn, each only for values that could still
+        # lift the expectation above alpha with the children left counted at
+        # the upper bound
+        totalValue = 0
+        remaining = 1
+        for (tile_pos, tile_value, p) in possibleSpawns:
+            if not self.timeRemaining():
+                return None
+            remaining -= p
+            childAlpha = (alpha - totalValue - high * remaining) / p
+            state.pushTile(tile_pos, tile_value)
+            value = self.maxStar(state, depth - 1, childAlpha, probability * p)
+            state.pop()
+            if value is None:
+                return None
+            totalValue += p * value
+            if value <= childAlpha:
+                self._pruneCount += 1
+                return totalValue + high * remaining
+
+        if self._cutoffCount == cutoffs:
+            self._table.put(key, depth, totalValue - score)
+        return totalValue
+
+    def upperBound(self, state, depth):
+        # The highest value a search of depth plies from state can return,
+        # from the most every heuristic() term can add and the most the score
+        # can grow. Both moves and spawns are counted as if every ply below
+        # were one, which only raises the bound.
+        tiles = state.getBoard()
+        score = state.getScore()
+        total = sum(1 << t for t in tiles if t)
+        maxExponent = max(tiles)
+        k = (depth + 1) // 2
+
+        # A move scores at most the sum of the tiles, which every spawn
+        # before it raises by 4 at most
+        gain = k * total + 2 * k * (k + 1)
+        total += 4 * k
+        largestExponent = total.bit_length() - 1
+
+        # The snake sum is largest with the largest tile on the top weight
+        # and the rest on the next one. The largest tile never shrinks, so
+        # the current one bounds the divisor from below.
+        snake = (SNAKE_WEIGHTS[1] * total / max(maxExponent, 1)
+                 + (SNAKE_WEIGHTS[0] - SNAKE_WEIGHTS[1]) * (1 << largestExponent) / max(largestExponent, 1))
+
+        return (score + gain + CORNER_BONUS + 16 * EMPTY_WEIGHT + snake
+                + 8 * MONOTONICITY_WEIGHT + 24 * MERGE_WEIGHT)
 
     def heuristic(self, state):
 
         # ----- Constants -----
         BOARD_SIZE = 4
         CORNER_INDICES = (0, 3, 12, 15)
-        SNAKE_WEIGHTS \
-            = (2048, 1024, 512, 256, 64, 32, 16, 8, 4, 2, 1, 1, 1, 1, 1, 1)
-
-        # ----- Tunable Component Weights -----
-        CORNER_BONUS = 10000
-        CORNER_PENALTY = -5000
-        EMPTY_WEIGHT = 1000
-        MONOTONICITY_WEIGHT = 3000
-        MERGE_WEIGHT = 2000
-        SMOOTHNESS_SCALE = 500
 
         # ----- Current State -----
         base_game_score = state.getScore()
-        tiles = list(state.getBoard())
+        tiles = state.getBoard()
         max_tile_exponent = max(tiles) if tiles else 0
 
         # ----- Local Helper Functions -----
@@ -204,3 +379,7 @@ class Player(BasePlayer):
     def stats(self):
         print(f'Average depth: {self._depthCount / self._count:.2f}')
         print(f'Branching factor: {self._childCount / self._parentCount:.2f}')
+        print(f'Probability cutoffs: {self._cutoffCount}')
+        if self._pruning:
+            print(f'Star pruning cutoffs: {self._pruneCount}')
+        self._table.stats()
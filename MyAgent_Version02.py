@@ -74,25 +74,21 @@ class Player(BasePlayer):
         if depth == 0:
             return self.heuristic(state)
 
-        possibleTiles = state.possibleTiles()
+        possibleSpawns = state.possibleSpawns()
         totalValue = 0
-        for (tile_pos, tile_value) in possibleTiles:
+        for (tile_pos, tile_value, probability) in possibleSpawns:
             if not self.timeRemaining():
                 return None
             result = state.addTile(tile_pos, tile_value)
-            if tile_value == 1:
-                probability = 0.9
-            else:
-                probability = 0.1
             value = self.maxPlayer(result, depth - 1)
             if value is None:
                 return None
             totalValue += probability * value
 
-        if possibleTiles:
-            return totalValue / len(possibleTiles)
+        if possibleSpawns:
+            return totalValue
         else:
-            self.heuristic(state)
+            return self.heuristic(state)
 
     def heuristic(self, state):
         return state.getScore()
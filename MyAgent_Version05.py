@@ -1,6 +1,7 @@
 # 5. Version: ExpectiMax with Further-Extended Heuristic and Best Move Memory
 
 from Game2048 import *
+from TranspositionTable import TranspositionTable
 
 
 class Player(BasePlayer):
@@ -15,8 +16,15 @@ class Player(BasePlayer):
 
         self._bestMove = None
 
+        # Values of searched positions, less the score they were reached with,
+        # keyed by packed board with the low bit set for chance nodes. The
+        # table is kept from move to move, since the position after the chosen
+        # move and the actual spawn was already searched a few plies deep.
+        self._table = TranspositionTable()
+
     def findMove(self, state):
         self._count += 1
+        self._table.newGeneration()
         actions = self.moveOrder(state)
         bestMove = None
         depth = 1
@@ -52,21 +60,28 @@ class Player(BasePlayer):
         if state.gameOver():
             return state.getScore()
 
-        actions = self.moveOrder(state)
+        key = state.toInt() << 1
+        score = state.getScore()
+        v = self._table.get(key, depth)
+        if v is not None:
+            return score + v
 
         if depth == 0:
-            return self.heuristic(state)
+            best = self.heuristic(state)
+        else:
+            actions = self.moveOrder(state)
 
-        self._parentCount += 1
-        best = float('-inf')
-        for a in actions:
-            if not self.timeRemaining(): return None
-            result = state.move(a)
-            v = self.chance(result, depth - 1)
-            if v is None: return None
-            if v > best:
-                best = v
+            self._parentCount += 1
+            best = float('-inf')
+            for a in actions:
+                if not self.timeRemaining(): return None
+                result = state.move(a)
+                v = self.chance(result, depth - 1)
+                if v is None: return None
+                if v > best:
+                    best = v
 
+        self._table.put(key, depth, best - score)
         return best
 
     def chance(self, state, depth):
@@ -76,28 +91,33 @@ class Player(BasePlayer):
         if state.gameOver():
             return state.getScore()
 
+        key = state.toInt() << 1 | 1
+        score = state.getScore()
+        value = self._table.get(key, depth)
+        if value is not None:
+            return score + value
+
         if depth == 0:
-            return self.heuristic(state)
+            value = self.heuristic(state)
+            self._table.put(key, depth, value - score)
+            return value
 
-        possibleTiles = state.possibleTiles()
+        possibleSpawns = state.possibleSpawns()
         totalValue = 0
-        for (tile_pos, tile_value) in possibleTiles:
+        for (tile_pos, tile_value, probability) in possibleSpawns:
             if not self.timeRemaining():
                 return None
             result = state.addTile(tile_pos, tile_value)
-            if tile_value == 1:
-                probability = 0.9
-            else:
-                probability = 0.1
             value = self.maxPlayer(result, depth - 1)
             if value is None:
                 return None
             totalValue += probability * value
 
-        if possibleTiles:
-            return totalValue / len(possibleTiles)
+        if possibleSpawns:
+            self._table.put(key, depth, totalValue - score)
+            return totalValue
         else:
-            self.heuristic(state)
+            return self.heuristic(state)
 
     def heuristic(self, state):
 
@@ -216,3 +236,4 @@ class Player(BasePlayer):
     def stats(self):
         print(f'Average depth: {self._depthCount / self._count:.2f}')
         print(f'Branching factor: {self._childCount / self._parentCount:.2f}')
+        self._table.stats()
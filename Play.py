@@ -1,9 +1,9 @@
 from Game2048 import *
 
-import sys, importlib, argparse, time
+import sys, importlib, argparse, random, time
 
-def play(agent, graphicsSize, delay):
-	state = Game2048()
+def play(agent, graphicsSize, delay, game=Game2048, rng=None):
+	state = game(rng=rng)
 	state.randomize()
 	if g is not None:
 		g.draw(state)
@@ -36,6 +36,8 @@ if __name__ == '__main__':
 	parser.add_argument('-g', type=int, help="size of graphics window")
 	parser.add_argument('-t', type=float, help="time delay")
 	parser.add_argument('-d', type=str, help="data file")
+	parser.add_argument('-b', action='store_true', help="use the packed bitboard")
+	parser.add_argument('-s', type=int, help="random seed for the tiles")
 	args = parser.parse_args()
 
 	try:
@@ -56,4 +58,14 @@ if __name__ == '__main__':
 	if args.d:
 		agent.loadData(args.d)
 
-	play(agent, g, args.t)
+	if args.b:
+		game = Bitboard2048
+	else:
+		game = Game2048
+
+	if args.s is not None:
+		rng = random.Random(args.s)
+	else:
+		rng = None
+
+	play(agent, g, args.t, game, rng)
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+class TranspositionTable:
+	# Search values keyed by packed board, each stored with the depth it was
+	# searched to. A lookup only hits when the stored search went at least as
+	# deep as the one asked for.
+	#
+	# The table never holds more than maxSize entries. With the 'depth' policy
+	# every key has one slot, shared with other keys, and a new entry never
+	# replaces a deeper one; a prime maxSize spreads the packed boards best.
+	# With the 'lru' policy the least recently used entry is dropped when the
+	# table is full.
+	#
+	# A table kept across searches should start each one with newGeneration().
+	# Entries from earlier generations still hit, but the 'depth' policy lets
+	# any new entry replace them whatever their depth. Under 'lru' they are
+	# already the first to go unless the new search has used them.
+	def __init__(self, maxSize=262139, policy='depth'):
+		if policy not in ('depth', 'lru'):
+			raise ValueError(f'Unknown replacement policy {policy!r}')
+		self._size = maxSize
+		self._policy = policy
+		self._hits = 0
+		self._misses = 0
+		self._generation = 0
+		self.clear()
+
+	def clear(self):
+		if self._policy == 'depth':
+			self._slots = [None] * self._size
+		else:
+			self._entries = OrderedDict()
+
+	def newGeneration(self):
+		self._generation += 1
+
+	def get(self, key, depth, exact=False):
+		# Returns the value stored for key if it was searched at least depth
+		# deep, or exactly depth deep when exact is set, otherwise None
+		if self._policy == 'depth':
+			entry = self._slots[key % self._size]
+			if entry is not None and entry[0] == key and (entry[1] == depth if exact else entry[1] >= depth):
+				self._hits += 1
+				return entry[2]
+		else:
+			entry = self._entries.get(key)
+			if entry is not None and (entry[0] == depth if exact else entry[0] >= depth):
+				self._entries.move_to_end(key)
+				self._hits += 1
+				return entry[1]
+		self._misses += 1
+		return None
+
+	def put(self, key, depth, value):
+		if self._policy == 'depth':
+			i = key % self._size
+			entry = self._slots[i]
+			if entry is None or entry[1] <= depth or entry[3] != self._generation:
+				self._slots[i] = (key, depth, value, self._generation)
+		else:
+			entries = self._entries
+			entries[key] = (depth, value)
+			entries.move_to_end(key)
+			if len(entries) > self._size:
+				entries.popitem(last=False)
+
+	def __len__(self):
+		if self._policy == 'depth':
+			return self._size - self._slots.count(None)
+		return len(self._entries)
+
+	def getHits(self):
+		return self._hits
+
+	def getMisses(self):
+		return self._misses
+
+	def stats(self):
+		lookups = self._hits + self._misses
+		if lookups:
+			print(f'Table hits: {self._hits} of {lookups} ({self._hits / lookups:.1%})')
+		print(f'Table entries: {len(self)} of {self._size}')
@@ -0,0 +1,197 @@
+from Game2048 import *
+
+import random, time, unittest
+import MyAgent
+
+try:
+	import numpy
+	from Batch2048 import Batch2048
+except ImportError:
+	numpy = None
+
+# The tiles of each line in the order a move slides them towards the front
+_REFERENCE_LINES = {
+	'L': [ [4*r + c for c in range(4)] for r in range(4) ],
+	'R': [ [4*r + c for c in range(3, -1, -1)] for r in range(4) ],
+	'U': [ [4*r + c for r in range(4)] for c in range(4) ],
+	'D': [ [4*r + c for r in range(3, -1, -1)] for c in range(4) ],
+}
+
+def referenceMove(board, score, action):
+	# The plain compress and merge loop, with no tables and no cap on the tiles
+	result = [0] * 16
+	for line in _REFERENCE_LINES[action]:
+		compressed = [ board[i] for i in line if board[i] != 0 ]
+		merged = []
+		j = 0
+		while j < len(compressed):
+			if j + 1 < len(compressed) and compressed[j] == compressed[j+1]:
+				merged.append(compressed[j] + 1)
+				score += 2 ** (compressed[j] + 1)
+				j += 2
+			else:
+				merged.append(compressed[j])
+				j += 1
+		for i, t in zip(line, merged):
+			result[i] = t
+	return result, score
+
+def referenceActions(board):
+	return ''.join([ a for a in 'UDLR' if referenceMove(board, 0, a)[0] != board ])
+
+def randomBoards(n, maxTile=14, seed=2048):
+	rng = random.Random(seed)
+	tiles = [0] * 6 + list(range(1, maxTile + 1))
+	for _ in range(n):
+		yield [ rng.choice(tiles) for _ in range(16) ], rng.randrange(5000)
+
+class TestEngines(unittest.TestCase):
+	# Game2048 and Bitboard2048 against the reference loop on boards both can hold
+
+	def testMove(self):
+		for board, s in randomBoards(3000):
+			g, b = Game2048(board, s), Bitboard2048(board, s)
+			for a in 'UDLR':
+				expected, score = referenceMove(board, s, a)
+				for m in (g.move(a), b.move(a)):
+					self.assertEqual(list(m.getBoard()), expected)
+					self.assertEqual(m.getScore(), score)
+
+	def testActions(self):
+		for board, s in randomBoards(3000):
+			expected = referenceActions(board)
+			self.assertEqual(Game2048(board, s).actions(), expected)
+			self.assertEqual(Bitboard2048(board, s).actions(), expected)
+
+	def testGameOver(self):
+		# Mostly full boards, so that some of them have no move left
+		rng = random.Random(5)
+		for _ in range(3000):
+			board = [ rng.randint(1, 6) for _ in range(16) ]
+			if rng.random() < .2:
+				board[rng.randrange(16)] = 0
+			expected = referenceActions(board) == ''
+			self.assertEqual(Game2048(board).gameOver(), expected)
+			self.assertEqual(Bitboard2048(board).gameOver(), expected)
+		self.assertTrue(Game2048().gameOver())
+		self.assertTrue(Bitboard2048().gameOver())
+
+	def testSymmetries(self):
+		for board, s in randomBoards(1000):
+			g, b = Game2048(board, s), Bitboard2048(board, s)
+			expected = [ list(x.getBoard()) for x in g.symmetries() ]
+			self.assertEqual([ list(x.getBoard()) for x in b.symmetries() ], expected)
+			self.assertEqual(expected[0], board)
+			for k in range(4):
+				self.assertEqual(list(g.rotate(k).getBoard()), list(b.rotate(k).getBoard()))
+			ints = [ x.toInt() for x in g.symmetries() ]
+			self.assertEqual(g.symmetryInts(), ints)
+			self.assertEqual(b.symmetryInts(), ints)
+			self.assertEqual(g.canonical(), min(ints))
+			self.assertEqual(b.canonical(), min(ints))
+
+	def testIntRoundTrip(self):
+		for board, s in randomBoards(1000, maxTile=15):
+			g, b = Game2048(board, s), Bitboard2048(board, s)
+			x = g.toInt()
+			self.assertEqual(b.toInt(), x)
+			self.assertLess(x, 1 << 64)
+			self.assertEqual(list(Game2048.fromInt(x).getBoard()), board)
+			self.assertEqual(list(Bitboard2048.fromInt(x).getBoard()), board)
+			self.assertEqual(g.pack().unpack(Bitboard2048).toInt(), x)
+
+class TestWideBoards(unittest.TestCase):
+	# Tiles above 32768 only fit in Game2048
+
+	def testMove(self):
+		for board, s in randomBoards(3000, maxTile=17):
+			g = Game2048(board, s)
+			for a in 'UDLR':
+				expected, score = referenceMove(board, s, a)
+				m = g.move(a)
+				self.assertEqual(list(m.getBoard()), expected)
+				self.assertEqual(m.getScore(), score)
+				self.assertEqual(m.getScore(), s + g.reward(a))
+			self.assertEqual(g.actions(), referenceActions(board))
+
+	def testIntRoundTrip(self):
+		for board, s in randomBoards(1000, maxTile=17):
+			g = Game2048(board, s)
+			x = g.toInt()
+			self.assertEqual(list(Game2048.fromInt(x).getBoard()), board)
+			self.assertEqual(g.symmetryInts(), [ y.toInt() for y in g.symmetries() ])
+			if max(board) > 15:
+				self.assertRaises(ValueError, Bitboard2048, board)
+				self.assertRaises(ValueError, Bitboard2048.fromInt, x)
+				self.assertIsInstance(g.pack().unpack(), Game2048)
+
+@unittest.skipIf(numpy is None, 'Batch2048 needs numpy')
+class TestBatch(unittest.TestCase):
+	# Batch2048 against Bitboard2048 one board at a time
+
+	def setUp(self):
+		self.boards = [ Bitboard2048(board, s) for board, s in randomBoards(2000) ]
+		self.batch = Batch2048.fromGames(self.boards)
+
+	def testMove(self):
+		for a in 'UDLR':
+			moved = self.batch.move(a)
+			for i, b in enumerate(self.boards):
+				m = b.move(a)
+				self.assertEqual(int(moved.getBoards()[i]), m.toInt())
+				self.assertEqual(int(moved.getScores()[i]), m.getScore())
+
+	def testActionMask(self):
+		masks = self.batch.actionMask()
+		over = self.batch.gameOver()
+		empty = self.batch.emptyCount()
+		for i, b in enumerate(self.boards):
+			self.assertEqual(int(masks[i]), b.actionMask())
+			self.assertEqual(bool(over[i]), b.gameOver())
+			self.assertEqual(int(empty[i]), b.emptyCount())
+
+	def testAddRandomTile(self):
+		spawned = self.batch.addRandomTile()
+		for i, b in enumerate(self.boards):
+			x = int(spawned.getBoards()[i])
+			if b.emptyCount():
+				self.assertIn(x, [ b.addTile(t, v).toInt() for t, v in b.possibleTiles() ])
+			else:
+				self.assertEqual(x, b.toInt())
+
+	def testRoundTrip(self):
+		self.assertEqual([ g.toInt() for g in self.batch.toGames() ], [ b.toInt() for b in self.boards ])
+		self.assertEqual(self.batch[7].toInt(), self.boards[7].toInt())
+		self.assertRaises(ValueError, Batch2048, [Game2048([16] + [0]*15).toInt()])
+
+class TestStarSearch(unittest.TestCase):
+	# Star1 pruning must pick the same move with the same value as plain expectimax
+
+	def bestMove(self, player, state, depth, search):
+		player._startTime = time.time()
+		best, move = float('-inf'), None
+		for a in state.actions():
+			state.pushMove(a)
+			v = search(player, state, depth - 1, best)
+			state.pop()
+			if v > best:
+				best, move = v, a
+		return move, best
+
+	def testSameMove(self):
+		rng = random.Random(0)
+		tiles = [0, 0, 0, 0, 1, 1, 2, 3, 4, 5, 6, 7]
+		n = 0
+		while n < 20:
+			state = Game2048([ rng.choice(tiles) for _ in range(16) ], rng.randrange(2000))
+			if state.gameOver():
+				continue
+			depth = rng.choice([2, 3, 4]) if state.emptyCount() > 4 else rng.choice([3, 5])
+			plain = self.bestMove(MyAgent.Player(100, 0), state, depth, lambda p, s, d, best: p.chance(s, d))
+			star = self.bestMove(MyAgent.Player(100, 0, True), state, depth, lambda p, s, d, best: p.chanceStar(s, d, best))
+			self.assertEqual(star[0], plain[0])
+			self.assertAlmostEqual(star[1], plain[1], delta=1e-9 * abs(plain[1]) + 1e-9)
+			n += 1
+
+if __name__ == '__main__':
+	unittest.main()